@@ -1,53 +1,18 @@
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
-def create_directories_with_files(temp_range, pressure_range=None,
-                                  constant_temp=None, constant_pressure=None,
-                                  base_dir="simulations"):
-    """
-    Creates directories for each (temperature, pressure) pair under base_dir
-    and populates them with run.lmp and required auxiliary files.
-    """
-    if constant_temp is not None:
-        temp_range = [constant_temp]
-    if constant_pressure is not None:
-        pressure_range = [constant_pressure]
-
-    if pressure_range is None:
-        pressure_range = [1.01325]  # bar, ~1 atm
+MAX_WORKERS = 16
 
-    # Ensure base output directory exists
-    os.makedirs(base_dir, exist_ok=True)
-
-    # Convert bar → atm (LAMMPS "real" units typically expect atm)
-    pressure_range_atm = [p * 0.986923 for p in pressure_range]
-
-    files_to_copy = [
-        "system.in.init",
-        "system.in.settings",
-        "system.data",
-        "diffusivity_msd.in.prop",
-        "viscosity.in.prop",
-        "submit.sh",
-    ]
-
-    for temp in temp_range:
-        for pressure_bar, pressure_atm in zip(pressure_range, pressure_range_atm):
-            folder_name = f"T_{temp}_P_{pressure_bar}"
-            dir_path = os.path.join(base_dir, folder_name)
-            os.makedirs(dir_path, exist_ok=True)
-
-            lammps_script_content = f"""
-variable        temp equal {temp}
-variable        press equal {pressure_atm}
-#neighbor 0.5 bin 
+# Everything in run.lmp after the per-cell temperature and pressure variables
+LAMMPS_SCRIPT_BODY = """#neighbor 0.5 bin 
 boundary        p p p
 
 include "system.in.init"
 read_data "system.data"
 include "system.in.settings"
 
-variable TEql equal ${{temp}} # K
+variable TEql equal ${temp} # K
 
 #----- conversion factors and coefficients
 
@@ -68,7 +33,7 @@ neigh_modify    every 1 delay 10 check yes
 
 write_data initial_config.data
 
-velocity        all create ${{temp}} 54654
+velocity        all create ${temp} 54654
 variable dt equal 1
 timestep        1
 
@@ -76,8 +41,8 @@ timestep        1
 thermo_style    custom step time temp press pe ke etotal enthalpy atoms lx ly lz vol density
 thermo 1000
 
-velocity   water create ${{temp}} 3125  loop local  dist gaussian
-fix md_nvt water nvt temp ${{temp}} ${{temp}} $(100.0*dt)
+velocity   water create ${temp} 3125  loop local  dist gaussian
+fix md_nvt water nvt temp ${temp} ${temp} $(100.0*dt)
 
 run         1000000
 
@@ -85,7 +50,7 @@ run         1000000
 unfix       md_nvt 
 
 # RUN-NPT
-fix md_npt water npt temp ${{temp}} ${{temp}} $(100.0*dt) iso ${{press}} ${{press}} $(1000.0*dt)
+fix md_npt water npt temp ${temp} ${temp} $(100.0*dt) iso ${press} ${press} $(1000.0*dt)
 
 #-------------------------- Dump the time-averaged global properties --------------------------
 
@@ -114,7 +79,7 @@ include diffusivity_msd.in.prop
 include viscosity.in.prop
 
 # write calculated properties to a file
-fix GlobalPropCalculated  all print $d  "time:${{time}}, D[H2O]:${{D_H2O}}, viscosity:${{vis}}" file GlobalPropCalculated.prop screen no
+fix GlobalPropCalculated  all print $d  "time:${time}, D[H2O]:${D_H2O}, viscosity:${vis}" file GlobalPropCalculated.prop screen no
 
 
 # vector properties
@@ -125,13 +90,94 @@ fix rdfOut  all ave/time $s $p $d  c_myRDF[*] file rdf_all.rdf mode vector
 run         5000000
 
 unfix         md_npt
-""".lstrip()
+"""
+
+def link_or_copy(src, dst):
+    """
+    Hardlinks src to dst, falling back to a regular copy when linking is not
+    possible (e.g. across filesystems). shutil.copy uses os.sendfile on
+    Linux, so the fallback still copies in-kernel.
+    """
+    # Replace rather than write through an existing dst: from a previous
+    # run it may be a hardlink to src itself
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+def create_cell_directory(temp, pressure_bar, pressure_atm, base_dir, sources):
+    """
+    Creates the directory for one (temperature, pressure) pair and populates
+    it with run.lmp and the auxiliary files listed in sources.
+    """
+    folder_name = f"T_{temp}_P_{pressure_bar}"
+    dir_path = os.path.join(base_dir, folder_name)
+    os.makedirs(dir_path, exist_ok=True)
 
-            with open(os.path.join(dir_path, "run.lmp"), "w") as f:
-                f.write(lammps_script_content)
+    lammps_script_content = (
+        f"variable        temp equal {temp}\n"
+        f"variable        press equal {pressure_atm}\n"
+        + LAMMPS_SCRIPT_BODY
+    )
+
+    with open(os.path.join(dir_path, "run.lmp"), "w") as f:
+        f.write(lammps_script_content)
+
+    for file_name, src in sources:
+        link_or_copy(src, os.path.join(dir_path, file_name))
+
+def create_directories_with_files(temp_range, pressure_range=None,
+                                  constant_temp=None, constant_pressure=None,
+                                  base_dir="simulations"):
+    """
+    Creates directories for each (temperature, pressure) pair under base_dir
+    and populates them with run.lmp and required auxiliary files.
+    """
+    if constant_temp is not None:
+        temp_range = [constant_temp]
+    if constant_pressure is not None:
+        pressure_range = [constant_pressure]
+
+    if pressure_range is None:
+        pressure_range = [1.01325]  # bar, ~1 atm
+
+    # Ensure base output directory exists
+    os.makedirs(base_dir, exist_ok=True)
+
+    # Convert bar → atm (LAMMPS "real" units typically expect atm)
+    pressure_range_atm = [p * 0.986923 for p in pressure_range]
+
+    files_to_copy = [
+        "system.in.init",
+        "system.in.settings",
+        "system.data",
+        "diffusivity_msd.in.prop",
+        "viscosity.in.prop",
+        "submit.sh",
+    ]
+    # Resolve the template sources once instead of per (T, P) cell
+    sources = [(file_name, os.path.abspath(file_name)) for file_name in files_to_copy]
+
+    cells = [
+        (temp, pressure_bar, pressure_atm)
+        for temp in temp_range
+        for pressure_bar, pressure_atm in zip(pressure_range, pressure_range_atm)
+    ]
 
-            for file_name in files_to_copy:
-                shutil.copy(file_name, os.path.join(dir_path, file_name))
+    # Cells are independent and the work is syscall bound, so threads overlap
+    # the filesystem latency
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(create_cell_directory, temp, pressure_bar, pressure_atm,
+                            base_dir, sources)
+            for temp, pressure_bar, pressure_atm in cells
+        ]
+        for future in futures:
+            future.result()
 
     print(f"Directories and files created successfully under: {os.path.abspath(base_dir)}")
 
@@ -13,6 +13,7 @@ Batch postprocessing:
 3) Recursively find rdf_all.rdf, compute averaged RDF, and save:
    results/rdf_T_<T>_P_<P>_<n>.png
    results/rdf_average_T_<T>_P_<P>_<n>.dat
+   results/rdf_average_T_<T>_P_<P>_<n>.npy   (columns r g77 g88 g78)
 
 4) Make preliminary plots (grouped by pressure) and save:
    results/T_vs_density.png
@@ -21,18 +22,25 @@ Batch postprocessing:
 
 Run:
   python postprocess_all.py /path/to/root
+  python postprocess_all.py /path/to/root --no-plot   (tables/data only, no .png)
 """
 
 from __future__ import annotations
 
 import argparse
+import mmap
+import os
 import re
 from collections import defaultdict
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, Tuple, Optional, List
+from typing import TYPE_CHECKING, Dict, Iterator, Tuple, Optional, List
 
 import numpy as np
-import matplotlib.pyplot as plt
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
 
 
 DENSITY_FILE = "GlobalPropsTimeAvg.prop"
@@ -40,19 +48,89 @@ CALC_FILE = "GlobalPropCalculated.prop"
 RDF_FILE = "rdf_all.rdf"
 
 TP_DIR_RE = re.compile(r"^T_(\d+)_P_(\d+)$")
+# "time:<t>, D[H2O]:<D>, viscosity:<eta>" as written by fix GlobalPropCalculated
+CALC_LINE_RE = re.compile(r"D\[H2O\]:\s*(?P<diff>[^,\s]+).*?\bviscosity:\s*(?P<visc>[^,\s]+)")
 
+# Per-(T,P) RDF plots are preliminary, so they are rendered at a lower dpi
+RDF_DPI = 150
 
-def find_tp_ancestor(p: Path) -> Optional[Tuple[int, int, Path]]:
-    """Walk upward to find nearest ancestor directory named like T_313_P_1."""
-    for parent in [p] + list(p.parents):
-        if parent.is_dir():
-            m = TP_DIR_RE.match(parent.name)
-            if m:
-                return int(m.group(1)), int(m.group(2)), parent
-    return None
+_rdf_fig: Optional[Figure] = None
+_rdf_ax: Optional[Axes] = None
+
+
+def _pyplot():
+    """Import pyplot on first use, so --no-plot runs never load matplotlib."""
+    import matplotlib
+
+    matplotlib.use("Agg")  # non-interactive, safe to use from worker processes
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def find_tp_ancestor(p: str) -> Optional[Tuple[int, int, str]]:
+    """Walk upward from directory p to the nearest one named like T_313_P_1."""
+    # Plain string slicing, no Path objects or stat calls per level
+    while True:
+        m = TP_DIR_RE.match(os.path.basename(p))
+        if m:
+            return int(m.group(1)), int(m.group(2)), p
+        parent = os.path.dirname(p)
+        if parent == p:
+            return None
+        p = parent
+
+
+def collect_tp_files(
+    root: Path,
+) -> Tuple[Dict[Tuple[int, int], Path], Dict[Tuple[int, int], Path], List[Tuple[int, int, Path]]]:
+    """
+    Walk root once and collect the density, calculated-property and RDF files
+    of every (T,P). A file belongs to its nearest T_<T>_P_<P> ancestor, so the
+    results_<jobid> folders copied back by submit.sh are picked up as well.
+    """
+    dens_paths: Dict[Tuple[int, int], Path] = {}
+    calc_paths: Dict[Tuple[int, int], Path] = {}
+    rdf_paths: List[Tuple[int, int, Path]] = []
+
+    # (T,P) of each visited directory, inherited from the parent unless the
+    # directory itself matches; root may already sit inside a T/P directory
+    root_str = str(root)
+    root_tp = find_tp_ancestor(root_str)
+    dir_tp: Dict[str, Optional[Tuple[int, int]]] = {
+        os.path.dirname(root_str): root_tp[:2] if root_tp else None
+    }
+
+    for dirpath, _, files in os.walk(root_str):
+        m = TP_DIR_RE.match(os.path.basename(dirpath))
+        tp = (int(m.group(1)), int(m.group(2))) if m else dir_tp.get(os.path.dirname(dirpath))
+        dir_tp[dirpath] = tp
+        if tp is None:
+            continue
+
+        names = set(files)
+        if DENSITY_FILE in names:
+            dens_paths.setdefault(tp, Path(dirpath, DENSITY_FILE))
+        if CALC_FILE in names:
+            calc_paths.setdefault(tp, Path(dirpath, CALC_FILE))
+        if RDF_FILE in names:
+            rdf_paths.append((tp[0], tp[1], Path(dirpath, RDF_FILE)))
+
+    return dens_paths, calc_paths, rdf_paths
 
 
 def avg_density(path: Path) -> float:
+    try:
+        dens = np.loadtxt(path, comments="#", usecols=-1, ndmin=1)
+    except ValueError:
+        # non-numeric tokens somewhere in the file: skip those lines by hand
+        return _avg_density_by_line(path)
+    if dens.size == 0:
+        raise ValueError("No density data lines found")
+    return float(dens.mean())
+
+
+def _avg_density_by_line(path: Path) -> float:
     total = 0.0
     n = 0
     with path.open("r", encoding="utf-8", errors="replace") as f:
@@ -72,61 +150,112 @@ def avg_density(path: Path) -> float:
     return total / n
 
 
+def last_data_line(path: Path) -> Optional[str]:
+    """Return the last non-comment line of path, scanning back from the end."""
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None  # an empty file cannot be mapped
+        # Only the pages near the end are ever read in
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            while end > 0:
+                start = mm.rfind(b"\n", 0, end) + 1
+                s = mm[start:end].strip()
+                if s and not s.startswith(b"#"):
+                    return s.decode("utf-8", errors="replace")
+                end = start - 1
+    return None
+
+
 def last_diff_visc(path: Path) -> Tuple[float, float]:
-    last = None
-    with path.open("r", encoding="utf-8", errors="replace") as f:
-        for line in f:
-            s = line.strip()
-            if s and not s.startswith("#"):
-                last = s
+    last = last_data_line(path)
     if last is None:
         raise ValueError("No data lines found")
 
-    fields: Dict[str, float] = {}
-    for item in last.split(","):
-        item = item.strip()
-        if ":" not in item:
-            continue
-        key, val = item.split(":", 1)
-        fields[key.strip()] = float(val.strip())
-
-    return fields["D[H2O]"], fields["viscosity"]
+    m = CALC_LINE_RE.search(last)
+    if not m:
+        raise ValueError("No D[H2O]/viscosity fields in last data line")
+    return float(m.group("diff")), float(m.group("visc"))
 
 
 def process_rdf(rdf_path: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    blocks = []
-    current = None
-
     with rdf_path.open("r", encoding="utf-8", errors="replace") as f:
-        for line in f:
-            if line.startswith("#") or not line.strip():
-                continue
-            parts = line.split()
-            if len(parts) == 2:
-                if current is not None:
-                    blocks.append(np.array(current, float))
-                current = []
-            else:
-                current.append([float(x) for x in parts])
-
-    if current is not None:
-        blocks.append(np.array(current, float))
-
-    if not blocks:
-        raise ValueError("No RDF blocks found")
+        lines = f.readlines()
 
-    r = blocks[0][:, 1]
-    g77 = np.mean([b[:, 2] for b in blocks], axis=0)
-    g88 = np.mean([b[:, 4] for b in blocks], axis=0)
-    g78 = np.mean([b[:, 6] for b in blocks], axis=0)
-    return r, g77, g88, g78
+    # LAMMPS only writes comment lines at the top; the rest is sliced by
+    # position without inspecting each row
+    start = 0
+    while start < len(lines) and lines[start].startswith("#"):
+        start += 1
+    del lines[:start]
 
+    if not lines:
+        raise ValueError("No RDF blocks found")
 
-def write_results_txt(results_dir: Path, records: Dict[Tuple[int, int], dict]) -> None:
-    out = results_dir / "results.txt"
-    lines: List[str] = []
-    lines.append(f"{'T(K)':>8} {'P(bar)':>8} {'Density':>12} {'SelfDiff':>15} {'Viscosity':>15}")
+    # Every block is a "timestep nbins" header followed by nbins rows
+    nbins = int(lines[0].split()[1])
+    stride = nbins + 1
+    nblocks = len(lines) // stride
+    if nblocks == 0:
+        raise ValueError("No RDF blocks found")
 
+    # Drop a trailing block that is still being written, then the headers
+    del lines[nblocks * stride:]
+    del lines[::stride]
+
+    data = np.loadtxt(lines, ndmin=2).reshape(nblocks, nbins, -1)
+
+    # Average the g(r) columns (2, 4, 6) over all blocks in one reduction
+    means = data[:, :, 2::2].mean(axis=0)
+    return data[0, :, 1], means[:, 0], means[:, 1], means[:, 2]
+
+
+def plot_rdf(out_png: str, r: np.ndarray, g77: np.ndarray, g88: np.ndarray, g78: np.ndarray) -> None:
+    # One figure per process, cleared and redrawn for every RDF
+    global _rdf_fig, _rdf_ax
+    if _rdf_fig is None:
+        _rdf_fig, _rdf_ax = _pyplot().subplots()
+
+    ax = _rdf_ax
+    ax.clear()
+    ax.plot(r, g77, label="O-O")
+    ax.plot(r, g88, label="H-H")
+    ax.plot(r, g78, label="O-H")
+    ax.set_xlabel("r")
+    ax.set_ylabel("g(r)")
+    ax.legend()
+    _rdf_fig.tight_layout()
+    _rdf_fig.savefig(out_png, dpi=RDF_DPI)
+
+
+def _process_one_rdf(args: Tuple[int, int, Path, str, int, bool]) -> bool:
+    """Pool worker: average one rdf_all.rdf, then save its data and (optionally) plot."""
+    T, P, rdf, results_str, idx, plot = args
+    # Output names as plain strings; numpy and matplotlib take them directly
+    avg_stem = f"{results_str}/rdf_average_T_{T}_P_{P}_{idx}"
+    try:
+        r, g77, g88, g78 = process_rdf(rdf)
+
+        # Save averaged data to results folder: full precision binary for
+        # further analysis, short fixed format text for reading
+        out = np.column_stack([r, g77, g88, g78])
+        np.save(f"{avg_stem}.npy", out)
+        np.savetxt(
+            f"{avg_stem}.dat",
+            out,
+            fmt="%.6e",
+            header="r g77 g88 g78",
+        )
+
+        # Save plot to results folder
+        if plot:
+            plot_rdf(f"{results_str}/rdf_T_{T}_P_{P}_{idx}.png", r, g77, g88, g78)
+    except Exception:
+        return False
+    return True
+
+
+def _results_rows(records: Dict[Tuple[int, int], dict]) -> Iterator[str]:
     for (T, P) in sorted(records.keys()):
         rec = records[(T, P)]
         dens = rec.get("density")
@@ -134,31 +263,42 @@ def write_results_txt(results_dir: Path, records: Dict[Tuple[int, int], dict]) -
         visc = rec.get("viscosity")
 
         if isinstance(dens, float) and isinstance(diff, float) and isinstance(visc, float):
-            lines.append(f"{T:>8} {P:>8} {dens:12.6f} {diff:15.6e} {visc:15.6e}")
+            yield f"{T:>8} {P:>8} {dens:12.6f} {diff:15.6e} {visc:15.6e}\n"
         else:
             # if missing/failed, still write something visible
-            lines.append(f"{T:>8} {P:>8} {'MISSING':>12} {'':>15} {'':>15}")
+            yield f"{T:>8} {P:>8} {'MISSING':>12} {'':>15} {'':>15}\n"
+
 
-    out.write_text("\n".join(lines), encoding="utf-8")
+def write_results_txt(results_dir: Path, records: Dict[Tuple[int, int], dict]) -> None:
+    out = results_dir / "results.txt"
+    # Stream rows straight into the buffered file instead of joining them first
+    with out.open("w", encoding="utf-8", buffering=65536) as fh:
+        fh.write(f"{'T(K)':>8} {'P(bar)':>8} {'Density':>12} {'SelfDiff':>15} {'Viscosity':>15}\n")
+        fh.writelines(_results_rows(records))
 
 
 def plot_vs_temperature(results_dir: Path, records: Dict[Tuple[int, int], dict]) -> None:
-    # Group by pressure so each pressure becomes a curve
-    by_p: Dict[int, List[Tuple[int, float, float, float]]] = defaultdict(list)
-    for (T, P), rec in records.items():
-        dens = rec.get("density")
-        diff = rec.get("self_diffusion")
-        visc = rec.get("viscosity")
-        if isinstance(dens, float) and isinstance(diff, float) and isinstance(visc, float):
-            by_p[P].append((T, dens, diff, visc))
+    # Columns: T, P, density, self_diffusion, viscosity
+    data = np.array(
+        [
+            (T, P, rec["density"], rec["self_diffusion"], rec["viscosity"])
+            for (T, P), rec in records.items()
+            if all(isinstance(rec.get(k), float) for k in ("density", "self_diffusion", "viscosity"))
+        ],
+        dtype=float,
+    ).reshape(-1, 5)
+
+    # Sort by pressure, then temperature, and split into one curve per pressure
+    data = data[np.lexsort((data[:, 0], data[:, 1]))]
+    pressures, starts = np.unique(data[:, 1], return_index=True)
+    curves = list(zip(pressures.astype(int), np.split(data, starts[1:])))
+
+    plt = _pyplot()
 
     def save_plot(y_index: int, ylabel: str, fname: str):
         plt.figure()
-        for P in sorted(by_p.keys()):
-            pts = sorted(by_p[P], key=lambda x: x[0])
-            Ts = [t for (t, _, _, _) in pts]
-            Ys = [x[y_index] for x in pts]  # 1=dens, 2=diff, 3=visc
-            plt.plot(Ts, Ys, marker="o", label=f"P={P} bar")
+        for P, curve in curves:
+            plt.plot(curve[:, 0], curve[:, y_index], marker="o", label=f"P={P} bar")
         plt.xlabel("Temperature (K)")
         plt.ylabel(ylabel)
         plt.legend()
@@ -166,14 +306,19 @@ def plot_vs_temperature(results_dir: Path, records: Dict[Tuple[int, int], dict])
         plt.savefig(results_dir / fname, dpi=300)
         plt.close()
 
-    save_plot(1, "Density", "T_vs_density.png")
-    save_plot(2, "Self-diffusion (D[H2O])", "T_vs_selfdiff.png")
-    save_plot(3, "Viscosity", "T_vs_viscosity.png")
+    save_plot(2, "Density", "T_vs_density.png")
+    save_plot(3, "Self-diffusion (D[H2O])", "T_vs_selfdiff.png")
+    save_plot(4, "Viscosity", "T_vs_viscosity.png")
 
 
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("root", nargs="?", default=".", help="Root directory to scan (default: .)")
+    ap.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="Only write results.txt and the RDF .dat/.npy files; skip matplotlib entirely",
+    )
     args = ap.parse_args()
 
     root = Path(args.root).resolve()
@@ -183,20 +328,7 @@ def main() -> None:
     # Collect per-(T,P) simulation properties
     records: Dict[Tuple[int, int], dict] = {}
 
-    dens_paths: Dict[Tuple[int, int], Path] = {}
-    calc_paths: Dict[Tuple[int, int], Path] = {}
-
-    for f in root.rglob(DENSITY_FILE):
-        tp = find_tp_ancestor(f.parent)
-        if tp:
-            T, P, _ = tp
-            dens_paths.setdefault((T, P), f)
-
-    for f in root.rglob(CALC_FILE):
-        tp = find_tp_ancestor(f.parent)
-        if tp:
-            T, P, _ = tp
-            calc_paths.setdefault((T, P), f)
+    dens_paths, calc_paths, rdf_paths = collect_tp_files(root)
 
     all_keys = sorted(set(dens_paths) | set(calc_paths), key=lambda k: (k[0], k[1]))
     for key in all_keys:
@@ -216,43 +348,22 @@ def main() -> None:
                 pass
 
     write_results_txt(results_dir, records)
-    plot_vs_temperature(results_dir, records)
+    if not args.no_plot:
+        plot_vs_temperature(results_dir, records)
 
-    # Process RDFs and save into results/
+    # Process RDFs and save into results/; numbering is fixed up front so
+    # the files can be handled in parallel
     rdf_counter: Dict[Tuple[int, int], int] = defaultdict(int)
+    work: List[Tuple[int, int, Path, str, int, bool]] = []
+    results_str = str(results_dir)
 
-    for rdf in root.rglob(RDF_FILE):
-        tp = find_tp_ancestor(rdf.parent)
-        if not tp:
-            continue
-        T, P, _ = tp
-        try:
-            r, g77, g88, g78 = process_rdf(rdf)
-
-            rdf_counter[(T, P)] += 1
-            idx = rdf_counter[(T, P)]
-
-            # Save plot to results folder
-            plt.figure()
-            plt.plot(r, g77, label="O-O")
-            plt.plot(r, g88, label="H-H")
-            plt.plot(r, g78, label="O-H")
-            plt.xlabel("r")
-            plt.ylabel("g(r)")
-            plt.legend()
-            plt.tight_layout()
-            plt.savefig(results_dir / f"rdf_T_{T}_P_{P}_{idx}.png", dpi=300)
-            plt.close()
-
-            # Save averaged data to results folder
-            out = np.column_stack([r, g77, g88, g78])
-            np.savetxt(
-                results_dir / f"rdf_average_T_{T}_P_{P}_{idx}.dat",
-                out,
-                header="r g77 g88 g78",
-            )
-        except Exception:
-            continue
+    for T, P, rdf in rdf_paths:
+        rdf_counter[(T, P)] += 1
+        work.append((T, P, rdf, results_str, rdf_counter[(T, P)], not args.no_plot))
+
+    if work:
+        with Pool() as pool:
+            pool.map(_process_one_rdf, work, chunksize=1)
 
 
 if __name__ == "__main__":
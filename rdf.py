@@ -3,29 +3,31 @@ import matplotlib.pyplot as plt
 
 fname = "rdf_all.rdf"
 
-blocks = []
-current = None
-
 with open(fname) as f:
-    for line in f:
-        if line.startswith("#") or not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) == 2:
-            if current is not None:
-                blocks.append(np.array(current, float))
-            current = []
-        else:
-            current.append([float(x) for x in parts])
-
-if current is not None:
-    blocks.append(np.array(current, float))
+    lines = f.readlines()
+
+# LAMMPS only writes comment lines at the top; the rest is sliced by
+# position without inspecting each row
+start = 0
+while start < len(lines) and lines[start].startswith("#"):
+    start += 1
+del lines[:start]
+
+# every block is a "timestep nbins" header followed by nbins rows
+nbins = int(lines[0].split()[1])
+stride = nbins + 1
+nblocks = len(lines) // stride
+
+# drop a trailing block that is still being written, then the headers
+del lines[nblocks * stride:]
+del lines[::stride]
+
+data = np.loadtxt(lines, ndmin=2).reshape(nblocks, nbins, -1)
 
 # average g(r) across all blocks
-g77_all = np.mean([b[:, 2] for b in blocks], axis=0)
-g88_all = np.mean([b[:, 4] for b in blocks], axis=0)
-g78_all = np.mean([b[:, 6] for b in blocks], axis=0)
-r = blocks[0][:, 1]
+means = data[:, :, 2::2].mean(axis=0)
+g77_all, g88_all, g78_all = means.T
+r = data[0, :, 1]
 
 plt.plot(r, g77_all, label="O-O")
 plt.plot(r, g88_all, label="H-H")
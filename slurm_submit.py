@@ -1,29 +1,65 @@
 import os
+import shlex
 import subprocess
 
+ARRAY_SCRIPT = "submit_array.sh"
+
+def write_array_script(parent_dir, job_dirs):
+    """
+    Writes ARRAY_SCRIPT into parent_dir: a Slurm job array whose task i runs
+    submit.sh from job_dirs[i]. The #SBATCH directives are copied from the
+    first submit.sh, since all directories are populated from one template.
+    """
+    with open(os.path.join(job_dirs[0], "submit.sh")) as f:
+        directives = [line for line in f if line.startswith("#SBATCH")]
+
+    dir_list = "\n".join(f"    {shlex.quote(d)}" for d in job_dirs)
+    script = "#!/bin/bash\n" + "".join(directives) + f"""
+DIRS=(
+{dir_list}
+)
+
+# Run submit.sh from its own directory, as a per-directory sbatch would,
+# so it copies that directory and writes results_<jobid> back into it
+cd "${{DIRS[$SLURM_ARRAY_TASK_ID]}}"
+export SLURM_SUBMIT_DIR="$PWD"
+exec bash submit.sh
+"""
+    with open(os.path.join(parent_dir, ARRAY_SCRIPT), "w") as f:
+        f.write(script)
+
 def submit_jobs_in_current_directory():
     """
-    Runs 'sbatch submit.sh' in each subdirectory of the current working directory if 'submit.sh' exists.
+    Submits a single Slurm job array with one task per subdirectory of the
+    current working directory that contains 'submit.sh'.
     """
     # Get the current working directory
     parent_dir = os.getcwd()
-    
-    # Iterate over each item in the current directory
-    for dir_name in os.listdir(parent_dir):
-        # Full path of the subdirectory
-        dir_path = os.path.join(parent_dir, dir_name)
-        
-        # Check if it is a directory and contains 'submit.sh'
-        submit_file = os.path.join(dir_path, "submit.sh")
-        if os.path.isdir(dir_path) and os.path.isfile(submit_file):
-            try:
-                # Run 'sbatch submit.sh' in the directory
-                print(f"Submitting job in directory: {dir_path}")
-                subprocess.run(["sbatch", "submit.sh"], cwd=dir_path, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Failed to submit job in {dir_path}: {e}")
-            except Exception as e:
-                print(f"Unexpected error in {dir_path}: {e}")
+
+    # Collect every subdirectory that contains 'submit.sh'
+    job_dirs = []
+    with os.scandir(parent_dir) as entries:
+        for entry in entries:
+            # Check if it is a directory (from the directory listing itself,
+            # no extra stat) and contains 'submit.sh'
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "submit.sh")):
+                job_dirs.append(entry.path)
+    job_dirs.sort()
+
+    if not job_dirs:
+        print(f"No directories with submit.sh found in: {parent_dir}")
+        return
+
+    try:
+        # One sbatch call (and one controller RPC) for all directories
+        write_array_script(parent_dir, job_dirs)
+        print(f"Submitting job array of {len(job_dirs)} jobs from: {parent_dir}")
+        subprocess.run(["sbatch", f"--array=0-{len(job_dirs) - 1}", ARRAY_SCRIPT],
+                       cwd=parent_dir, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Failed to submit job array in {parent_dir}: {e}")
+    except Exception as e:
+        print(f"Unexpected error in {parent_dir}: {e}")
 
 # Run the function to submit jobs in the current working directory
 submit_jobs_in_current_directory()